@@ -225,6 +225,7 @@ ffi('entry_unset_ctime', [c_archive_entry_p], None)
 ffi('entry_unset_birthtime', [c_archive_entry_p], None)
 
 ffi('entry_copy_pathname', [c_archive_entry_p, c_char_p], None)
+ffi('entry_copy_sourcepath_w', [c_archive_entry_p, c_wchar_p], None)
 ffi('entry_update_pathname_utf8', [c_archive_entry_p, c_char_p], c_int, check_int)
 ffi('entry_copy_link', [c_archive_entry_p, c_char_p], None)
 ffi('entry_update_link_utf8', [c_archive_entry_p, c_char_p], c_int, check_int)
@@ -286,6 +287,9 @@ ffi('read_disk_set_standard_lookup', [c_archive_p], c_int, check_int)
 ffi('read_disk_open', [c_archive_p, c_char_p], c_int, check_int)
 ffi('read_disk_open_w', [c_archive_p, c_wchar_p], c_int, check_int)
 ffi('read_disk_descend', [c_archive_p], c_int, check_int)
+ffi('read_disk_entry_from_file',
+    [c_archive_p, c_archive_entry_p, c_int, c_void_p],
+    c_int, check_int)
 
 # archive_read_data
 
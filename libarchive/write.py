@@ -1,6 +1,9 @@
 from contextlib import contextmanager
-from ctypes import byref, cast, c_char, c_size_t, c_void_p, POINTER
-from posixpath import join
+from ctypes import (
+    byref, cast, c_char, c_size_t, c_void_p, create_string_buffer, POINTER,
+)
+from os import lstat, scandir
+from stat import S_ISDIR
 import warnings
 
 from . import ffi
@@ -11,17 +14,27 @@ from .ffi import (
     page_size, entry_sourcepath, entry_clear, read_disk_new, read_disk_open_w,
     read_next_header2, read_disk_descend, read_free, write_header, write_data,
     write_finish_entry,
-    read_disk_set_behavior
+    read_disk_set_behavior, read_disk_entry_from_file, entry_copy_sourcepath_w
+)
+from .flags import (
+    READDISK_HONOR_NODUMP, READDISK_NO_TRAVERSE_MOUNTS, READDISK_RESTORE_ATIME,
+)
+
+
+# The `READDISK_*` flags that only affect the traversal of directories.
+TRAVERSAL_FLAGS = (
+    READDISK_HONOR_NODUMP | READDISK_NO_TRAVERSE_MOUNTS | READDISK_RESTORE_ATIME
 )
 
 
 @contextmanager
-def new_archive_read_disk(path, flags=0, lookup=False):
+def new_archive_read_disk(path=None, flags=0, lookup=False):
     archive_p = read_disk_new()
     read_disk_set_behavior(archive_p, flags)
     if lookup:
         ffi.read_disk_set_standard_lookup(archive_p)
-    read_disk_open_w(archive_p, path)
+    if path is not None:
+        read_disk_open_w(archive_p, path)
     try:
         yield archive_p
     finally:
@@ -33,6 +46,17 @@ class ArchiveWrite:
     def __init__(self, archive_p, header_codec='utf-8'):
         self._pointer = archive_p
         self.header_codec = header_codec
+        # A single entry struct is reused for all the files added through the
+        # `add_*` methods, instead of allocating and freeing one per call.
+        self._entry = ArchiveEntry(header_codec=header_codec)
+
+    def _get_entry(self):
+        """Return the reusable entry, cleared and with the current codec.
+        """
+        entry = self._entry
+        entry.header_codec = self.header_codec
+        entry_clear(entry._entry_p)
+        return entry
 
     def add_entries(self, entries):
         """Add the given entries to the archive.
@@ -74,43 +98,153 @@ class ArchiveWrite:
         block_size = ffi.write_get_bytes_per_block(write_p)
         if block_size <= 0:
             block_size = 10240  # pragma: no cover
+        buf = create_string_buffer(block_size)
 
-        entry = ArchiveEntry(header_codec=self.header_codec)
+        entry = self._get_entry()
         entry_p = entry._entry_p
-        destination_path = attributes.pop('pathname', None)
+        destination_path = pathname
+        if destination_path:
+            destination_prefix = destination_path.rstrip('/') + '/'
+        # The paths read from the disk must be re-encoded if the header codec
+        # isn't UTF-8, otherwise they only need to be set when they change.
+        recode_path = self.header_codec != 'utf-8'
         for path in paths:
+            # Paths read from the disk all start with `path`, so we know in
+            # advance whether they'll have to be rewritten.
+            rewrite_paths = (
+                destination_path or recode_path or path.startswith('/')
+            )
+            path_len = len(path)
             with new_archive_read_disk(path, flags, lookup) as read_p:
                 while 1:
                     r = read_next_header2(read_p, entry_p)
                     if r == ARCHIVE_EOF:
                         break
-                    entry_path = entry.pathname
-                    if destination_path:
-                        if entry_path == path:
-                            entry_path = destination_path
-                        else:
-                            assert entry_path.startswith(path)
-                            entry_path = join(
-                                destination_path,
-                                entry_path[len(path):].lstrip('/')
-                            )
-                    entry.pathname = entry_path.lstrip('/')
+                    if rewrite_paths:
+                        entry_path = entry.pathname
+                        if destination_path:
+                            if entry_path == path:
+                                entry_path = destination_path
+                            else:
+                                entry_path = destination_prefix + (
+                                    entry_path[path_len:].lstrip('/')
+                                )
+                        entry.pathname = entry_path.lstrip('/')
                     if attributes:
                         entry.modify(**attributes)
                     read_disk_descend(read_p)
                     write_header(write_p, entry_p)
                     if entry.isreg:
-                        with open(entry_sourcepath(entry_p), 'rb') as f:
-                            while 1:
-                                data = f.read(block_size)
-                                if not data:
-                                    break
-                                write_data(write_p, data, len(data))
+                        self._write_file_data(entry_sourcepath(entry_p), buf)
                     write_finish_entry(write_p)
                     entry_clear(entry_p)
                     if not recursive:
                         break
 
+    def add_files_sorted(
+        self, *paths, flags=0, lookup=False, pathname=None, recursive=True,
+        **attributes
+    ):
+        """Read files through the OS and add them to the archive in inode order.
+
+        Unlike `add_files()`, which follows the order in which directories are
+        read, this method lists all the files first, then adds them sorted by
+        inode number. On many filesystems that order is close to the physical
+        order of the files, which reduces seeking when they aren't cached.
+
+        Args:
+            paths (str): the paths of the files to add to the archive
+            flags (int):
+                passed to the C function `archive_read_disk_set_behavior`;
+                the directories are traversed in Python, so only the flags that
+                affect the reading of metadata apply (`READDISK_NO_XATTR`,
+                `READDISK_NO_ACL`, `READDISK_NO_FFLAGS`, `READDISK_MAC_COPYFILE`)
+            lookup (bool): see `add_files()`
+            pathname (str | None): see `add_files()`
+            recursive (bool): see `add_files()`
+            attributes (dict): passed to `ArchiveEntry.modify()`
+
+        Raises:
+            ValueError: if `flags` contains a traversal flag
+                        (`READDISK_RESTORE_ATIME`, `READDISK_HONOR_NODUMP` or
+                        `READDISK_NO_TRAVERSE_MOUNTS`)
+            OSError: if a directory can't be listed
+            ArchiveError: if a file doesn't exist or can't be accessed, or if
+                          adding it to the archive fails
+        """
+        if flags & TRAVERSAL_FLAGS:
+            raise ValueError(
+                "add_files_sorted() doesn't support the READDISK_RESTORE_ATIME, "
+                "READDISK_HONOR_NODUMP and READDISK_NO_TRAVERSE_MOUNTS flags, "
+                "use add_files() instead"
+            )
+        destination_path = pathname
+        if destination_path:
+            destination_prefix = destination_path.rstrip('/') + '/'
+        files = []
+        for path in paths:
+            path_len = len(path)
+            try:
+                st = lstat(path)
+            except OSError:
+                # Let libarchive report the error when the file is added
+                files.append((0, path, destination_path or path))
+                continue
+            files.append((st.st_ino, path, destination_path or path))
+            # Like `add_files()`, don't follow symlinks, not even the given ones
+            if not recursive or not S_ISDIR(st.st_mode):
+                continue
+            dirs = [path]
+            while dirs:
+                with scandir(dirs.pop()) as it:
+                    for dir_entry in it:
+                        entry_path = dir_entry.path
+                        if destination_path:
+                            entry_path = destination_prefix + (
+                                entry_path[path_len:].lstrip('/')
+                            )
+                        files.append(
+                            (dir_entry.inode(), dir_entry.path, entry_path)
+                        )
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            dirs.append(dir_entry.path)
+        files.sort()
+
+        write_p = self._pointer
+
+        block_size = ffi.write_get_bytes_per_block(write_p)
+        if block_size <= 0:
+            block_size = 10240  # pragma: no cover
+        buf = create_string_buffer(block_size)
+
+        entry = self._get_entry()
+        entry_p = entry._entry_p
+        with new_archive_read_disk(None, flags, lookup) as read_p:
+            for _, path, entry_path in files:
+                entry_clear(entry_p)
+                entry_copy_sourcepath_w(entry_p, path)
+                entry.pathname = entry_path.lstrip('/')
+                read_disk_entry_from_file(read_p, entry_p, -1, None)
+                if attributes:
+                    entry.modify(**attributes)
+                write_header(write_p, entry_p)
+                if entry.isreg:
+                    self._write_file_data(path, buf)
+                write_finish_entry(write_p)
+
+    def _write_file_data(self, path, buf):
+        """Copy the content of a file into the archive, through `buf`.
+        """
+        write_p = self._pointer
+        # The file is read without buffering, directly into the ctypes buffer,
+        # which is then passed to libarchive without conversion.
+        with open(path, 'rb', buffering=0) as f:
+            while 1:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                write_data(write_p, buf, n)
+
     def add_file(self, path, **kw):
         "Single-path alias of `add_files()`"
         return self.add_files(path, **kw)
@@ -132,27 +266,33 @@ class ArchiveWrite:
         """
         archive_pointer = self._pointer
 
-        if isinstance(entry_data, bytes):
-            entry_data = (entry_data,)
-        elif isinstance(entry_data, str):
+        if isinstance(entry_data, str):
             raise TypeError(
                 "entry_data: expected bytes, got %r" % type(entry_data)
             )
 
-        entry = ArchiveEntry(
+        entry = self._get_entry()
+        entry.modify(
             pathname=entry_path, size=entry_size, filetype=filetype,
-            perm=permission, header_codec=self.header_codec,
-            **other_attributes
+            perm=permission, **other_attributes
         )
         write_header(archive_pointer, entry._entry_p)
 
-        for chunk in entry_data:
-            if not chunk:
-                break
-            write_data(archive_pointer, chunk, len(chunk))
+        if isinstance(entry_data, bytes):
+            if entry_data:
+                write_data(archive_pointer, entry_data, len(entry_data))
+        else:
+            for chunk in entry_data:
+                if not chunk:
+                    break
+                write_data(archive_pointer, chunk, len(chunk))
 
         write_finish_entry(archive_pointer)
 
+    @property
+    def bytes_written(self):
+        return ffi.filter_bytes(self._pointer, -1)
+
 
 @contextmanager
 def new_archive_write(format_name, filter_name=None, options='', passphrase=None):
@@ -161,7 +301,11 @@ def new_archive_write(format_name, filter_name=None, options='', passphrase=None
         ffi.get_write_format_function(format_name)(archive_p)
         if filter_name:
             ffi.get_write_filter_function(filter_name)(archive_p)
-        if passphrase and 'encryption' not in options:
+        if not options:
+            options = b''
+        elif not isinstance(options, bytes):
+            options = options.encode('utf-8')
+        if passphrase and b'encryption' not in options:
             if format_name == 'zip':
                 warnings.warn(
                     "The default encryption scheme of zip archives is weak. "
@@ -169,10 +313,8 @@ def new_archive_write(format_name, filter_name=None, options='', passphrase=None
                     "type you want to use. The supported values are 'zipcrypt' "
                     "(the weak default), 'aes128' and 'aes256'."
                 )
-            options += ',encryption' if options else 'encryption'
+            options += b',encryption' if options else b'encryption'
         if options:
-            if not isinstance(options, bytes):
-                options = options.encode('utf-8')
             ffi.write_set_options(archive_p, options)
         if passphrase:
             if not isinstance(passphrase, bytes):
@@ -192,10 +334,6 @@ def new_archive_write(format_name, filter_name=None, options='', passphrase=None
         ffi.write_free(archive_p)
         raise
 
-    @property
-    def bytes_written(self):
-        return ffi.filter_bytes(self._pointer, -1)
-
 
 @contextmanager
 def custom_writer(
@@ -1,6 +1,7 @@
-from contextlib import closing, contextmanager
+from collections import namedtuple
+from contextlib import contextmanager
 from copy import copy
-from os import chdir, getcwd, stat, walk
+from os import chdir, getcwd, scandir, stat
 from os.path import abspath, dirname, join
 from stat import S_ISREG
 import tarfile
@@ -15,6 +16,12 @@ from libarchive import file_reader
 data_dir = join(dirname(__file__), 'data')
 
 
+EntryRec = namedtuple('EntryRec', (
+    'path mtime size mode isreg isdir islnk issym linkpath '
+    'isblk ischr isfifo isdev uid gid'
+))
+
+
 def check_archive(archive, tree):
     tree2 = copy(tree)
     for e in archive:
@@ -38,8 +45,8 @@ def check_archive(archive, tree):
 
 def get_entries(location):
     """
-    Using the archive file at `location`, return an iterable of name->value
-    mappings for each libarchive.ArchiveEntry objects essential attributes.
+    Using the archive file at `location`, return an iterable of `EntryRec`
+    tuples of each libarchive.ArchiveEntry objects essential attributes.
     Paths are base64-encoded because JSON is UTF-8 and cannot handle
     arbitrary binary pathdata.
     """
@@ -48,58 +55,58 @@ def get_entries(location):
             # libarchive introduces prefixes such as h prefix for
             # hardlinks: tarfile does not, so we ignore the first char
             mode = entry.strmode[1:].decode('ascii')
-            yield {
-                'path': surrogate_decode(entry.pathname),
-                'mtime': entry.mtime,
-                'size': entry.size,
-                'mode': mode,
-                'isreg': entry.isreg,
-                'isdir': entry.isdir,
-                'islnk': entry.islnk,
-                'issym': entry.issym,
-                'linkpath': surrogate_decode(entry.linkpath),
-                'isblk': entry.isblk,
-                'ischr': entry.ischr,
-                'isfifo': entry.isfifo,
-                'isdev': entry.isdev,
-                'uid': entry.uid,
-                'gid': entry.gid
-            }
+            yield EntryRec(
+                path=surrogate_decode(entry.pathname),
+                mtime=entry.mtime,
+                size=entry.size,
+                mode=mode,
+                isreg=entry.isreg,
+                isdir=entry.isdir,
+                islnk=entry.islnk,
+                issym=entry.issym,
+                linkpath=surrogate_decode(entry.linkpath),
+                isblk=entry.isblk,
+                ischr=entry.ischr,
+                isfifo=entry.isfifo,
+                isdev=entry.isdev,
+                uid=entry.uid,
+                gid=entry.gid,
+            )
 
 
 def get_tarinfos(location):
     """
     Using the tar archive file at `location`, return an iterable of
-    name->value mappings for each tarfile.TarInfo objects essential
-    attributes.
+    `EntryRec` tuples of each tarfile.TarInfo objects essential attributes.
     Paths are base64-encoded because JSON is UTF-8 and cannot handle
     arbitrary binary pathdata.
     """
-    with closing(tarfile.open(location)) as tar:
+    with tarfile.open(location, mode='r|*') as tar:
         for entry in tar:
             path = surrogate_decode(entry.path or '')
-            if entry.isdir() and not path.endswith('/'):
+            isdir = entry.isdir()
+            if isdir and not path.endswith('/'):
                 path += '/'
             # libarchive introduces prefixes such as h prefix for
             # hardlinks: tarfile does not, so we ignore the first char
             mode = filemode(entry.mode)[1:]
-            yield {
-                'path': path,
-                'mtime': entry.mtime,
-                'size': entry.size,
-                'mode': mode,
-                'isreg': entry.isreg(),
-                'isdir': entry.isdir(),
-                'islnk': entry.islnk(),
-                'issym': entry.issym(),
-                'linkpath': surrogate_decode(entry.linkpath or None),
-                'isblk': entry.isblk(),
-                'ischr': entry.ischr(),
-                'isfifo': entry.isfifo(),
-                'isdev': entry.isdev(),
-                'uid': entry.uid,
-                'gid': entry.gid
-            }
+            yield EntryRec(
+                path=path,
+                mtime=entry.mtime,
+                size=entry.size,
+                mode=mode,
+                isreg=entry.isreg(),
+                isdir=isdir,
+                islnk=entry.islnk(),
+                issym=entry.issym(),
+                linkpath=surrogate_decode(entry.linkpath or None),
+                isblk=entry.isblk(),
+                ischr=entry.ischr(),
+                isfifo=entry.isfifo(),
+                isdev=entry.isdev(),
+                uid=entry.uid,
+                gid=entry.gid,
+            )
 
 
 @contextmanager
@@ -112,22 +119,51 @@ def in_dir(dirpath):
         chdir(prev)
 
 
-def stat_dict(path):
+def stat_dict(st):
     keys = set(('uid', 'gid', 'mtime'))
-    mode, _, _, _, uid, gid, size, _, mtime, _ = stat(path)
+    mode, _, _, _, uid, gid, size, _, mtime, _ = st
     if S_ISREG(mode):
         keys.add('size')
     return {k: v for k, v in locals().items() if k in keys}
 
 
+def walk_stats(d):
+    """
+    Yield the path and `os.stat_result` of `d` and of everything under it.
+    """
+    yield d, stat(d)
+    dirs = [d]
+    while dirs:
+        with scandir(dirs.pop()) as it:
+            for entry in it:
+                # Symlinks aren't followed, like libarchive doesn't by default.
+                # `DirEntry.stat()` caches its result, and `is_dir()` doesn't
+                # need a system call at all on most platforms.
+                yield entry.path, entry.stat(follow_symlinks=False)
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+
+
 def treestat(d, stat_dict=stat_dict):
-    r = {}
-    for dirpath, dirnames, filenames in walk(d):
-        r[dirpath] = stat_dict(dirpath)
-        for fname in filenames:
-            fpath = join(dirpath, fname)
-            r[fpath] = stat_dict(fpath)
-    return r
+    """
+    Return a dict mapping the paths of `d` and of everything under it to the
+    result of `stat_dict` called with their `os.stat_result`.
+    """
+    return {path: stat_dict(st) for path, st in walk_stats(d)}
+
+
+def check_tree(d, tree):
+    """
+    Check that `d` and everything under it match `tree`, as returned by
+    `treestat(d)`, stopping at the first difference.
+    """
+    tree2 = copy(tree)
+    for path, st in walk_stats(d):
+        assert path in tree2
+        assert stat_dict(st) == tree2.pop(path)
+
+    # Check that there are no missing directories or files
+    assert len(tree2) == 0
 
 
 def surrogate_decode(o):
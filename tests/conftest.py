@@ -0,0 +1,38 @@
+import locale
+import os
+import time
+
+import pytest
+
+from libarchive import memory_writer
+
+from . import treestat
+
+
+@pytest.fixture(scope='session', autouse=True)
+def locale_and_timezone():
+    locale.setlocale(locale.LC_ALL, '')
+    # needed for sane time stamp comparison
+    os.environ['TZ'] = 'UTC'
+    try:
+        time.tzset()
+    except AttributeError:  # pragma: no cover
+        pass  # Windows
+
+
+@pytest.fixture(scope='session')
+def libarchive_tree():
+    """The metadata of the `libarchive/` directory and of everything in it.
+
+    Tests must not modify it, `check_archive` works on a copy.
+    """
+    return treestat('libarchive')
+
+
+@pytest.fixture(scope='session')
+def libarchive_xz_tarball():
+    """An xz-compressed gnutar archive of the `libarchive/` directory."""
+    buf = bytes(1_000_000)
+    with memory_writer(buf, 'gnutar', 'xz') as archive:
+        archive.add_files('libarchive/')
+    return buf
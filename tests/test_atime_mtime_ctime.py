@@ -1,6 +1,3 @@
-from copy import copy
-from os import stat
-
 from libarchive import (file_reader, file_writer, memory_reader, memory_writer)
 
 import pytest
@@ -10,18 +7,22 @@ from . import treestat
 
 # NOTE: zip does not support high resolution time data, but pax and others do
 def check_atime_ctime(archive, tree, timefmt=int):
-    tree2 = copy(tree)
+    actual = {}
     for entry in archive:
-        epath = str(entry).rstrip('/')
-        assert epath in tree2
-        estat = tree2.pop(epath)
-        assert entry.atime == timefmt(estat.st_atime)
-        assert entry.ctime == timefmt(estat.st_ctime)
-
-
-def stat_dict(path):
+        path = entry.pathname
+        if entry.isdir and path.endswith('/'):
+            path = path[:-1]
+        actual[path] = (entry.atime, entry.ctime)
+    expected = {
+        path: (timefmt(estat.st_atime), timefmt(estat.st_ctime))
+        for path, estat in tree.items()
+    }
+    assert actual == expected
+
+
+def stat_dict(st):
     # return the raw stat output, the tuple output only returns ints
-    return stat(path)
+    return st
 
 
 def time_check(time_tuple, timefmt):
@@ -30,24 +31,31 @@ def time_check(time_tuple, timefmt):
     return timefmt(maths)
 
 
-@pytest.mark.parametrize('archfmt,timefmt', [('zip', int), ('pax', float)])
-def test_memory_atime_ctime(archfmt, timefmt):
+# The parametrization is module-scoped so that the archives are only created
+# once per format, by the fixtures below.
+archive_formats = pytest.mark.parametrize(
+    'archfmt,timefmt', [('zip', int), ('pax', float)], scope='module'
+)
+
+
+@pytest.fixture(scope='module')
+def memory_archive(archfmt):
+    """An archive of our libarchive/ directory, and the stats of its files"""
     # Collect information on what should be in the archive
     tree = treestat('libarchive', stat_dict)
 
     # Create an archive of our libarchive/ directory
-    buf = bytes(bytearray(1000000))
-    with memory_writer(buf, archfmt) as archive1:
-        archive1.add_files('libarchive/')
+    buf = bytes(1_000_000)
+    with memory_writer(buf, archfmt) as archive:
+        archive.add_files('libarchive/')
 
-    # Check the data
-    with memory_reader(buf) as archive2:
-        check_atime_ctime(archive2, tree, timefmt=timefmt)
+    return tree, buf
 
 
-@pytest.mark.parametrize('archfmt,timefmt', [('zip', int), ('pax', float)])
-def test_file_atime_ctime(archfmt, timefmt, tmpdir):
-    archive_path = "{0}/test.{1}".format(tmpdir.strpath, archfmt)
+@pytest.fixture(scope='module')
+def file_archive(archfmt, tmp_path_factory):
+    """An archive file of our libarchive/ directory, and the stats of its files"""
+    archive_path = str(tmp_path_factory.mktemp('archives') / f'test.{archfmt}')
 
     # Collect information on what should be in the archive
     tree = treestat('libarchive', stat_dict)
@@ -56,25 +64,37 @@ def test_file_atime_ctime(archfmt, timefmt, tmpdir):
     with file_writer(archive_path, archfmt) as archive:
         archive.add_files('libarchive/')
 
+    return tree, archive_path
+
+
+@archive_formats
+def test_memory_atime_ctime(archfmt, timefmt, memory_archive):
+    tree, buf = memory_archive
+
+    # Check the data
+    with memory_reader(buf) as archive2:
+        check_atime_ctime(archive2, tree, timefmt=timefmt)
+
+
+@archive_formats
+def test_file_atime_ctime(archfmt, timefmt, file_archive):
+    tree, archive_path = file_archive
+
     # Read the archive and check that the data is correct
     with file_reader(archive_path) as archive:
         check_atime_ctime(archive, tree, timefmt=timefmt)
 
 
-@pytest.mark.parametrize('archfmt,timefmt', [('zip', int), ('pax', float)])
-def test_memory_time_setters(archfmt, timefmt):
+@archive_formats
+def test_memory_time_setters(archfmt, timefmt, memory_archive):
     has_birthtime = archfmt != 'zip'
-
-    # Create an archive of our libarchive/ directory
-    buf = bytes(bytearray(1000000))
-    with memory_writer(buf, archfmt) as archive1:
-        archive1.add_files('libarchive/')
+    buf = memory_archive[1]
 
     atimestamp = (1482144741, 495628118)
     mtimestamp = (1482155417, 659017086)
     ctimestamp = (1482145211, 536858081)
     btimestamp = (1482144740, 495628118)
-    buf2 = bytes(bytearray(1000000))
+    buf2 = bytes(1_000_000)
     with memory_reader(buf) as archive1:
         with memory_writer(buf2, archfmt) as archive2:
             for entry in archive1:
@@ -85,24 +105,24 @@ def test_memory_time_setters(archfmt, timefmt):
                     entry.set_birthtime(*btimestamp)
                 archive2.add_entries([entry])
 
+    atime = time_check(atimestamp, timefmt)
+    mtime = time_check(mtimestamp, timefmt)
+    ctime = time_check(ctimestamp, timefmt)
+    btime = time_check(btimestamp, timefmt)
     with memory_reader(buf2) as archive2:
         for entry in archive2:
-            assert entry.atime == time_check(atimestamp, timefmt)
-            assert entry.mtime == time_check(mtimestamp, timefmt)
-            assert entry.ctime == time_check(ctimestamp, timefmt)
+            assert entry.atime == atime
+            assert entry.mtime == mtime
+            assert entry.ctime == ctime
             if has_birthtime:
-                assert entry.birthtime == time_check(btimestamp, timefmt)
+                assert entry.birthtime == btime
 
 
-@pytest.mark.parametrize('archfmt,timefmt', [('zip', int), ('pax', float)])
-def test_file_time_setters(archfmt, timefmt, tmpdir):
+@archive_formats
+def test_file_time_setters(archfmt, timefmt, file_archive, tmp_path):
     has_birthtime = archfmt != 'zip'
-
-    # Create an archive of our libarchive/ directory
-    archive_path = tmpdir.join('/test.{0}'.format(archfmt)).strpath
-    archive2_path = tmpdir.join('/test2.{0}'.format(archfmt)).strpath
-    with file_writer(archive_path, archfmt) as archive1:
-        archive1.add_files('libarchive/')
+    archive_path = file_archive[1]
+    archive2_path = str(tmp_path / f'test2.{archfmt}')
 
     atimestamp = (1482144741, 495628118)
     mtimestamp = (1482155417, 659017086)
@@ -118,10 +138,14 @@ def test_file_time_setters(archfmt, timefmt, tmpdir):
                     entry.set_birthtime(*btimestamp)
                 archive2.add_entries([entry])
 
+    atime = time_check(atimestamp, timefmt)
+    mtime = time_check(mtimestamp, timefmt)
+    ctime = time_check(ctimestamp, timefmt)
+    btime = time_check(btimestamp, timefmt)
     with file_reader(archive2_path) as archive2:
         for entry in archive2:
-            assert entry.atime == time_check(atimestamp, timefmt)
-            assert entry.mtime == time_check(mtimestamp, timefmt)
-            assert entry.ctime == time_check(ctimestamp, timefmt)
+            assert entry.atime == atime
+            assert entry.mtime == mtime
+            assert entry.ctime == ctime
             if has_birthtime:
-                assert entry.birthtime == time_check(btimestamp, timefmt)
+                assert entry.birthtime == btime
@@ -1,22 +1,18 @@
 from libarchive import memory_reader, memory_writer
 
-from . import check_archive, treestat
+from . import check_archive
 
 
-def test_convert():
-
-    # Collect information on what should be in the archive
-    tree = treestat('libarchive')
-
-    # Create an archive of our libarchive/ directory
-    buf = bytes(bytearray(1000000))
-    with memory_writer(buf, 'gnutar', 'xz') as archive1:
-        archive1.add_files('libarchive/')
+def test_convert(libarchive_tree, libarchive_xz_tarball):
+    tree = libarchive_tree
+    buf = libarchive_xz_tarball
 
     # Convert the archive to another format
-    buf2 = bytes(bytearray(1000000))
+    buf2 = bytes(1_000_000)
     with memory_reader(buf) as archive1:
-        with memory_writer(buf2, 'zip') as archive2:
+        with memory_writer(
+            buf2, 'zip', options='zip:compression=store'
+        ) as archive2:
             archive2.add_entries(archive1)
 
     # Check the data
@@ -6,7 +6,7 @@ from libarchive import ArchiveError, ffi, memory_writer
 
 
 def test_add_files_nonexistent():
-    with memory_writer(bytes(bytearray(4096)), 'zip') as archive:
+    with memory_writer(bytes(64), 'zip') as archive:
         with pytest.raises(ArchiveError) as e:
             archive.add_files('nonexistent')
         assert e.value.msg
@@ -28,13 +28,12 @@ def test_check_null():
     assert str(e)
 
 
-def test_error_string_decoding(monkeypatch):
-    monkeypatch.setattr(ffi, 'error_string', lambda *_: None)
+@pytest.mark.parametrize('error_string,expected_type', [
+    (None, type(None)),
+    (b'a', str),
+    ('\xe9'.encode('utf8'), bytes),
+])
+def test_error_string_decoding(monkeypatch, error_string, expected_type):
+    monkeypatch.setattr(ffi, 'error_string', lambda *_: error_string)
     r = ffi._error_string(None)
-    assert r is None
-    monkeypatch.setattr(ffi, 'error_string', lambda *_: b'a')
-    r = ffi._error_string(None)
-    assert isinstance(r, type(''))
-    monkeypatch.setattr(ffi, 'error_string', lambda *_: '\xe9'.encode('utf8'))
-    r = ffi._error_string(None)
-    assert isinstance(r, bytes)
+    assert type(r) is expected_type
@@ -2,26 +2,21 @@
 
 import io
 import json
+from os import lstat
 
 import libarchive
 from libarchive.entry import format_time
 from libarchive.extract import EXTRACT_OWNER, EXTRACT_PERM, EXTRACT_TIME
+from libarchive.flags import READDISK_NO_TRAVERSE_MOUNTS
 from libarchive.write import memory_writer
-from unittest.mock import patch
 import pytest
 
-from . import check_archive, in_dir, treestat
+from . import check_archive, check_tree, in_dir
 
 
-def test_buffers(tmpdir):
-
-    # Collect information on what should be in the archive
-    tree = treestat('libarchive')
-
-    # Create an archive of our libarchive/ directory
-    buf = bytes(bytearray(1000000))
-    with libarchive.memory_writer(buf, 'gnutar', 'xz') as archive:
-        archive.add_files('libarchive/')
+def test_buffers(tmp_path, libarchive_tree, libarchive_xz_tarball):
+    tree = libarchive_tree
+    buf = libarchive_xz_tarball
 
     # Read the archive and check that the data is correct
     with libarchive.memory_reader(buf) as archive:
@@ -29,23 +24,23 @@ def test_buffers(tmpdir):
         assert archive.format_name == b'GNU tar format'
         assert archive.filter_names == [b'xz']
 
-    # Extract the archive in tmpdir and check that the data is intact
-    with in_dir(tmpdir.strpath):
+    # Extract the archive in tmp_path and check that the data is intact
+    with in_dir(tmp_path):
         flags = EXTRACT_OWNER | EXTRACT_PERM | EXTRACT_TIME
         libarchive.extract_memory(buf, flags)
-        tree2 = treestat('libarchive')
-        assert tree2 == tree
+        check_tree('libarchive', tree)
 
 
-def test_fd(tmpdir):
-    archive_file = open(tmpdir.strpath+'/test.tar.bz2', 'w+b')
+def test_fd(tmp_path, libarchive_tree):
+    archive_file = open(tmp_path / 'test.tar.bz2', 'w+b')
     fd = archive_file.fileno()
 
-    # Collect information on what should be in the archive
-    tree = treestat('libarchive')
+    tree = libarchive_tree
 
     # Create an archive of our libarchive/ directory
-    with libarchive.fd_writer(fd, 'gnutar', 'bzip2') as archive:
+    with libarchive.fd_writer(
+        fd, 'gnutar', 'bzip2', options='bzip2:compression-level=1'
+    ) as archive:
         archive.add_files('libarchive/')
 
     # Read the archive and check that the data is correct
@@ -55,23 +50,23 @@ def test_fd(tmpdir):
         assert archive.format_name == b'GNU tar format'
         assert archive.filter_names == [b'bzip2']
 
-    # Extract the archive in tmpdir and check that the data is intact
+    # Extract the archive in tmp_path and check that the data is intact
     archive_file.seek(0)
-    with in_dir(tmpdir.strpath):
+    with in_dir(tmp_path):
         flags = EXTRACT_OWNER | EXTRACT_PERM | EXTRACT_TIME
         libarchive.extract_fd(fd, flags)
-        tree2 = treestat('libarchive')
-        assert tree2 == tree
+        check_tree('libarchive', tree)
 
 
-def test_files(tmpdir):
-    archive_path = tmpdir.strpath+'/test.tar.gz'
+def test_files(tmp_path, libarchive_tree):
+    archive_path = str(tmp_path / 'test.tar.gz')
 
-    # Collect information on what should be in the archive
-    tree = treestat('libarchive')
+    tree = libarchive_tree
 
     # Create an archive of our libarchive/ directory
-    with libarchive.file_writer(archive_path, 'ustar', 'gzip') as archive:
+    with libarchive.file_writer(
+        archive_path, 'ustar', 'gzip', options='gzip:compression-level=1'
+    ) as archive:
         archive.add_files('libarchive/')
 
     # Read the archive and check that the data is correct
@@ -80,17 +75,15 @@ def test_files(tmpdir):
         assert archive.format_name == b'POSIX ustar format'
         assert archive.filter_names == [b'gzip']
 
-    # Extract the archive in tmpdir and check that the data is intact
-    with in_dir(tmpdir.strpath):
+    # Extract the archive in tmp_path and check that the data is intact
+    with in_dir(tmp_path):
         flags = EXTRACT_OWNER | EXTRACT_PERM | EXTRACT_TIME
         libarchive.extract_file(archive_path, flags)
-        tree2 = treestat('libarchive')
-        assert tree2 == tree
+        check_tree('libarchive', tree)
 
 
-def test_custom_writer_and_stream_reader():
-    # Collect information on what should be in the archive
-    tree = treestat('libarchive')
+def test_custom_writer_and_stream_reader(libarchive_tree):
+    tree = libarchive_tree
 
     # Create an archive of our libarchive/ directory
     stream = io.BytesIO()
@@ -105,34 +98,107 @@ def test_custom_writer_and_stream_reader():
         assert archive.filter_names == []
 
 
-@patch('libarchive.ffi.write_fail')
-def test_write_fail(write_fail_mock):
-    buf = bytes(bytearray(1000000))
+def test_write_fail(monkeypatch):
+    calls = []
+    monkeypatch.setattr(libarchive.ffi, 'write_fail', lambda *_: calls.append(1))
+    buf = bytes(1_000_000)
     try:
-        with memory_writer(buf, 'gnutar', 'xz') as archive:
+        with memory_writer(buf, 'gnutar') as archive:
             archive.add_files('libarchive/')
             raise TypeError
     except TypeError:
         pass
-    assert write_fail_mock.called
+    assert calls
 
 
-@patch('libarchive.ffi.write_fail')
-def test_write_not_fail(write_fail_mock):
-    buf = bytes(bytearray(1000000))
-    with memory_writer(buf, 'gnutar', 'xz') as archive:
+def test_write_not_fail(monkeypatch):
+    calls = []
+    monkeypatch.setattr(libarchive.ffi, 'write_fail', lambda *_: calls.append(1))
+    buf = bytes(1_000_000)
+    with memory_writer(buf, 'gnutar') as archive:
         archive.add_files('libarchive/')
-    assert not write_fail_mock.called
+    assert not calls
 
 
 def test_adding_nonexistent_file_to_archive():
     stream = io.BytesIO()
-    with libarchive.custom_writer(stream.write, 'zip') as archive:
+    with libarchive.custom_writer(
+        stream.write, 'zip', options='zip:compression=store'
+    ) as archive:
         with pytest.raises(libarchive.ArchiveError):
             archive.add_files('nonexistent')
         archive.add_files('libarchive/')
 
 
+def test_adding_files_sorted(libarchive_tree):
+    tree = libarchive_tree
+
+    # Create an archive of our libarchive/ directory
+    stream = io.BytesIO()
+    with libarchive.custom_writer(stream.write, 'gnutar') as archive:
+        with pytest.raises(libarchive.ArchiveError):
+            archive.add_files_sorted('nonexistent')
+        archive.add_files_sorted('libarchive/')
+    stream.seek(0)
+
+    # Read the archive and check that the data is correct
+    with libarchive.stream_reader(stream) as archive:
+        check_archive(archive, tree)
+
+    # Check that the files were added in inode order
+    stream.seek(0)
+    with libarchive.stream_reader(stream) as archive:
+        inodes = [lstat(entry.pathname).st_ino for entry in archive]
+    assert inodes == sorted(inodes)
+
+
+def test_adding_files_sorted_with_arguments():
+    def get_paths(method, *args, **kw):
+        stream = io.BytesIO()
+        with libarchive.custom_writer(stream.write, 'gnutar') as archive:
+            getattr(archive, method)(*args, **kw)
+        stream.seek(0)
+        with libarchive.stream_reader(stream) as archive:
+            return [entry.pathname for entry in archive]
+
+    for kw in ({'pathname': 'foo/'}, {'recursive': False}):
+        assert sorted(get_paths('add_files_sorted', 'libarchive/', **kw)) == \
+            sorted(get_paths('add_files', 'libarchive/', **kw))
+    with pytest.raises(ValueError):
+        get_paths(
+            'add_files_sorted', 'libarchive/', flags=READDISK_NO_TRAVERSE_MOUNTS
+        )
+
+
+def test_adding_files_sorted_with_a_symlinked_directory(tmp_path):
+    (tmp_path / 'dir' / 'sub').mkdir(parents=True)
+    (tmp_path / 'dir' / 'sub' / 'a').write_bytes(b'a')
+    (tmp_path / 'toplink').symlink_to('dir')
+
+    # The link must be stored as is, without the content of its target
+    stream = io.BytesIO()
+    with in_dir(tmp_path):
+        with libarchive.custom_writer(stream.write, 'gnutar') as archive:
+            archive.add_files_sorted('toplink')
+    stream.seek(0)
+    with libarchive.stream_reader(stream) as archive:
+        entries = [(entry.pathname, entry.issym) for entry in archive]
+    assert entries == [('toplink', True)]
+
+
+def test_adding_files_with_destination_path():
+    stream = io.BytesIO()
+    with libarchive.custom_writer(stream.write, 'gnutar') as archive:
+        archive.add_files('libarchive/', pathname='foo/')
+        archive.add_files('README.rst', pathname='bar/README')
+    stream.seek(0)
+    with libarchive.stream_reader(stream) as archive:
+        paths = [entry.pathname for entry in archive]
+    assert paths[0] == 'foo/'
+    assert 'foo/entry.py' in paths
+    assert paths[-1] == 'bar/README'
+
+
 @pytest.mark.parametrize(
     'archfmt,data_bytes',
     [('zip', b'content'),
@@ -144,40 +210,60 @@ def test_adding_entry_from_memory(archfmt, data_bytes):
     entry_data = data_bytes
     entry_size = len(data_bytes)
 
-    blocks = []
-
-    archfmt = 'zip'
-    has_birthtime = archfmt != 'zip'
+    # Not all formats can store all the metadata
+    has_atime_ctime = archfmt != 'gnutar'
+    has_birthtime = archfmt == 'pax'
+    has_owner = archfmt != '7zip'
 
     atime = (1482144741, 495628118)
     mtime = (1482155417, 659017086)
     ctime = (1482145211, 536858081)
     btime = (1482144740, 495628118) if has_birthtime else None
 
-    def write_callback(data):
-        blocks.append(data[:])
-        return len(data)
-
-    with libarchive.custom_writer(write_callback, archfmt) as archive:
+    stream = io.BytesIO()
+    with libarchive.custom_writer(stream.write, archfmt) as archive:
         archive.add_file_from_memory(
             entry_path, entry_size, entry_data,
             atime=atime, mtime=mtime, ctime=ctime, birthtime=btime,
             uid=1000, gid=1000,
         )
 
-    buf = b''.join(blocks)
+    buf = stream.getvalue()
     with libarchive.memory_reader(buf) as memory_archive:
         for archive_entry in memory_archive:
             expected = entry_data
             actual = b''.join(archive_entry.get_blocks())
             assert expected == actual
             assert archive_entry.path == entry_path
-            assert archive_entry.atime in (atime[0], format_time(*atime))
             assert archive_entry.mtime in (mtime[0], format_time(*mtime))
-            assert archive_entry.ctime in (ctime[0], format_time(*ctime))
+            if has_atime_ctime:
+                assert archive_entry.atime in (atime[0], format_time(*atime))
+                assert archive_entry.ctime in (ctime[0], format_time(*ctime))
             if has_birthtime:
                 assert archive_entry.birthtime in (
                     btime[0], format_time(*btime)
                 )
-            assert archive_entry.uid == 1000
-            assert archive_entry.gid == 1000
+            if has_owner:
+                assert archive_entry.uid == 1000
+                assert archive_entry.gid == 1000
+
+
+def test_options_as_bytes_with_passphrase():
+    stream = io.BytesIO()
+    with libarchive.custom_writer(
+        stream.write, 'zip', options=b'zip:encryption=aes128',
+        passphrase='secret',
+    ) as archive:
+        archive.add_file_from_memory('foo', 3, b'bar')
+    stream.seek(0)
+    with libarchive.stream_reader(stream, passphrase='secret') as archive:
+        for entry in archive:
+            assert b''.join(entry.get_blocks()) == b'bar'
+
+
+def test_bytes_written():
+    stream = io.BytesIO()
+    with libarchive.custom_writer(stream.write, 'gnutar') as archive:
+        assert archive.bytes_written == 0
+        archive.add_files('README.rst')
+        assert archive.bytes_written >= len(stream.getvalue()) > 0
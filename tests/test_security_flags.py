@@ -3,7 +3,7 @@
 import pytest
 import os
 
-from libarchive import extract_file, file_reader
+from libarchive import extract_file
 from libarchive.extract import (
     EXTRACT_SECURE_NOABSOLUTEPATHS, EXTRACT_SECURE_NODOTDOT,
 )
@@ -11,17 +11,40 @@ from libarchive.exception import ArchiveError
 from . import data_dir
 
 
+# The tests in this module extract the same files outside of any temporary
+# directory, so they must not run concurrently when pytest-xdist is used
+# (`pytest -n auto --dist loadgroup`).
+pytestmark = pytest.mark.xdist_group('security_flags')
+
+
+archive_path = os.path.join(data_dir, 'flags.tar')
+# The paths of the entries of flags.tar
+archive_entries = (
+    '/tmp/python-libarchive-c-test-absolute-file',
+    '../python-libarchive-c-test-dot-dot-file',
+)
+
+
+def remove_extracted_files():
+    for path in archive_entries:
+        if os.path.exists(path):
+            os.remove(path)
+
+
 def run_test(flags):
-    archive_path = os.path.join(data_dir, 'flags.tar')
     try:
-        extract_file(archive_path, 0)
         with pytest.raises(ArchiveError):
             extract_file(archive_path, flags)
     finally:
-        with file_reader(archive_path) as archive:
-            for entry in archive:
-                if os.path.exists(entry.pathname):
-                    os.remove(entry.pathname)
+        remove_extracted_files()
+
+
+def test_extraction_without_security_flags():
+    # Check that the archive is only rejected because of the flags
+    try:
+        extract_file(archive_path, 0)
+    finally:
+        remove_extracted_files()
 
 
 def test_extraction_is_secure_by_default():